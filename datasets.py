@@ -19,6 +19,9 @@ import torchaudio
 
 from utils import die_if # @oss-only
 # @fb-only: from langtech.tts.vocoders.utils import die_if 
+
+from utils import distributed_rank, distributed_world_size # @oss-only
+# @fb-only: from langtech.tts.vocoders.utils import distributed_rank, distributed_world_size 
 from omegaconf import MISSING
 
 with warnings.catch_warnings():
@@ -291,17 +294,23 @@ class VocoderDataset(torch.utils.data.IterableDataset):
           Spectrogram shape: [num_bands, num_frames]
           Waveform shape: [num_frames * hop_samples]
         """
+        # Split training data among distributed processes. Validation and
+        # generation only run on the main process, so they see all the data.
+        indices = self.indices
+        if not self.validation and not self.generate:
+            world_size = distributed_world_size()
+            rank = distributed_rank()
+            indices = [idx for i, idx in enumerate(indices) if i % world_size == rank]
+
         # Split data among workers.
         worker_info = torch.utils.data.get_worker_info()
         if worker_info is not None:
             indices = [
                 idx
-                for i, idx in enumerate(self.indices)
+                for i, idx in enumerate(indices)
                 if i % worker_info.num_workers  # pylint: disable=no-member
                 == worker_info.id  # pylint: disable=no-member
             ]
-        else:
-            indices = self.indices
 
         for key in indices:
             waveform, sr = self.dataset[key][:2]
@@ -347,6 +356,8 @@ def create_dataloader(
         batch_size=1 if generate else config.batch_size,
         num_workers=config.dataloader_num_workers,
         prefetch_factor=config.dataloader_prefetch_factor,
+        # Pinned batches can be copied to the GPU asynchronously.
+        pin_memory=torch.cuda.is_available(),
     )
 
 
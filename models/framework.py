@@ -33,6 +33,9 @@ from path_utils import get_default_config_path # @oss-only
 from utils import die_if, hard_exit # @oss-only
 # @fb-only: from langtech.tts.vocoders.utils import die_if, hard_exit 
 
+from utils import distributed_barrier, distributed_mean, is_main_process # @oss-only
+# @fb-only: from langtech.tts.vocoders.utils import distributed_barrier, distributed_mean, is_main_process 
+
 from utils import read_audio, write_audio # @oss-only
 # @fb-only: from langtech.tts.vocoders.utils import read_audio, write_audio 
 from omegaconf import OmegaConf
@@ -100,6 +103,10 @@ class Vocoder(torch.nn.Module):
 
     command: str = ""
 
+    # Whether the model wraps itself in DistributedDataParallel when a process
+    # group is initialized, and so can be trained with torchrun.
+    supports_distributed: bool = False
+
     def __init__(self, config: ConfigProtocol) -> None:
         """
         Initialize this vocoder model.
@@ -295,7 +302,16 @@ def cli_train(
       config_file: Configuration file name.
       config_updates: Dotlist formatted updates to the base config.
     """
-    create_if_missing(model_name, model_class, path, config_file, config_updates)
+    die_if(
+        int(os.environ.get("WORLD_SIZE", "1")) > 1
+        and not model_class.supports_distributed,
+        f"{model_name} does not support distributed training; run without torchrun",
+    )
+    if model_class.supports_distributed:
+        init_distributed()
+    if is_main_process():
+        create_if_missing(model_name, model_class, path, config_file, config_updates)
+    distributed_barrier()
     print(f"Training {model_name} model located at {path}.")
 
     model = load_model(model_class, path, eval_mode=False)
@@ -312,6 +328,22 @@ def cli_train(
     )
 
 
+def init_distributed() -> None:
+    """
+    Initialize the NCCL process group when launched with torchrun, e.g.
+
+      torchrun --nproc_per_node=N cli.py wavenet train ...
+
+    Each process is bound to the GPU given by its LOCAL_RANK. When not
+    launched with torchrun this does nothing and training is single-process.
+    """
+    if "LOCAL_RANK" not in os.environ or torch.distributed.is_initialized():
+        return
+
+    torch.cuda.set_device(int(os.environ["LOCAL_RANK"]))
+    torch.distributed.init_process_group("nccl")
+
+
 def load_model(
     model_class: Type[Vocoder],
     model_dir: str,
@@ -563,7 +595,10 @@ def train_loop(  # noqa
       valid_set: A DataLoader for loading validation data.
       generate_set: A DataLoader for loading data to generate audio from.
     """
-    writer = SummaryWriter(log_dir=log_dir)
+    # Only the main process logs, so other ranks don't leave empty event files.
+    writer: Optional[SummaryWriter] = (
+        SummaryWriter(log_dir=log_dir) if is_main_process() else None
+    )
 
     if torch.cuda.is_available():
         # Move model to GPU.
@@ -602,8 +637,8 @@ def train_loop(  # noqa
             data_loading_total_time += time.time() - data_loading_start_time
 
         if torch.cuda.is_available():
-            spectrograms = spectrograms.cuda()
-            waveforms = waveforms.cuda()
+            spectrograms = spectrograms.cuda(non_blocking=True)
+            waveforms = waveforms.cuda(non_blocking=True)
         loss, tb_logs = model.train_step(spectrograms, waveforms)
         num_iterations += 1
         model.global_step += 1
@@ -614,21 +649,23 @@ def train_loop(  # noqa
 
         elapsed = time.time() - iter_start_time
         elapsed_total = int((time.time() - total_start_time) / 60)
-        print_loss = float(loss.detach().cpu().numpy())
-        print(
-            f"{elapsed_total}m - {elapsed:.3f}s",
-            "-",
-            f"Iteration {model.global_step}: {print_loss:.3f}",
-            flush=True,
-        )
-        if model.global_step % 50 == 0:
+        # Report the loss averaged over all distributed processes.
+        print_loss = float(distributed_mean(loss.detach()).cpu().numpy())
+        if writer is not None:
+            print(
+                f"{elapsed_total}m - {elapsed:.3f}s",
+                "-",
+                f"Iteration {model.global_step}: {print_loss:.3f}",
+                flush=True,
+            )
+        if model.global_step % 50 == 0 and writer is not None:
             print(
                 f"Average data loading time: {data_loading_total_time / num_iterations:.3f}"
             )
         iter_start_time = time.time()
         signal.alarm(0)
 
-        if model.global_step % LOG_FREQUENCY == 0:
+        if model.global_step % LOG_FREQUENCY == 0 and writer is not None:
             writer.add_scalar("train/loss", print_loss, global_step=model.global_step)
             for key, value in tb_logs.items():
                 writer.add_scalar("train/" + key, value, global_step=model.global_step)
@@ -637,19 +674,26 @@ def train_loop(  # noqa
             print("Detected NaN loss. Exiting!")
             hard_exit(1)
 
+        # In distributed training only the main process evaluates, saves, and
+        # generates; the others wait for it so they don't time out in all-reduce.
         if model.global_step % EVAL_FREQUENCY == 0:
-            model.eval()
-            compute_validation_metrics(model, valid_set, writer)
-            model.train()
+            if writer is not None:
+                model.eval()
+                compute_validation_metrics(model, valid_set, writer)
+                model.train()
 
-            # Save model every time we eval.
-            save_model(model, checkpoint_dir)
+                # Save model every time we eval.
+                save_model(model, checkpoint_dir)
+            distributed_barrier()
 
         if model.global_step % GENERATE_FREQUENCY == 0:
-            generate_tensorboard_samples(model, generate_set, writer)
+            if writer is not None:
+                generate_tensorboard_samples(model, generate_set, writer)
+            distributed_barrier()
 
     print("Completed training.")
-    save_model(model, checkpoint_dir)
+    if is_main_process():
+        save_model(model, checkpoint_dir)
 
 
 def save_model(model: Vocoder, checkpoint_dir: str) -> None:
@@ -793,7 +837,7 @@ def generate_tensorboard_samples(
             ground_truth.append(wav)
 
             if torch.cuda.is_available():
-                spec = spec.cuda()
+                spec = spec.cuda(non_blocking=True)
             generated.append(model.generate(spec, True))
 
     # Write samples, including original if needed, to Tensorboard.
@@ -833,8 +877,8 @@ def compute_validation_metrics(
 
     for spectrograms, waveforms in dataloader:
         if torch.cuda.is_available():
-            spectrograms = spectrograms.cuda()
-            waveforms = waveforms.cuda()
+            spectrograms = spectrograms.cuda(non_blocking=True)
+            waveforms = waveforms.cuda(non_blocking=True)
         losses.append(model.validation_losses(spectrograms, waveforms))
 
     if not losses:
@@ -868,11 +912,11 @@ def compute_evaluation_metrics(
 
     for i, (spectrograms, waveforms) in progress:
         if torch.cuda.is_available():
-            spectrograms = spectrograms.cuda()
+            spectrograms = spectrograms.cuda(non_blocking=True)
 
         wav_gen = model.generate(spectrograms)
 
-        spectrograms_gen = mel(wav_gen.unsqueeze(0))
+        spectrograms_gen = mel(wav_gen.unsqueeze(0).to(spectrograms.device))
 
         write_audio(
             os.path.join(path, "..", "waveforms", "%05d.wav" % (i + 1)),
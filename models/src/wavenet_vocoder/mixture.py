@@ -264,7 +264,7 @@ def sample_from_mix_gaussian(y, log_scale_min=-7.0):
             means, log_scales = y[:, :, 1], y[:, :, 2]
 
     scales = torch.exp(log_scales)
-    dist = Normal(loc=means, scale=scales)
+    dist = Normal(loc=means, scale=scales, validate_args=False)
     x = dist.sample()
 
     x = torch.clamp(x, min=-1.0, max=1.0)
@@ -7,15 +7,14 @@
 WaveNet Neural Vocoder.
 """
 import math
+import os
 from dataclasses import dataclass
-from typing import List, Optional, Tuple, Dict
+from typing import Callable, ContextManager, List, Optional, Tuple, Dict
 
 import models.src.wavenet_vocoder.wavenet as wavenet # @oss-only
 # @fb-only: import langtech.tts.vocoders.models.src.wavenet_vocoder.wavenet as wavenet 
 import numpy as np
 import torch
-import torchaudio
-import torchaudio.models
 
 from datasets import ( # @oss-only
 # @fb-only: from langtech.tts.vocoders.datasets import ( 
@@ -65,6 +64,28 @@ from torch import Tensor
 from torch.nn import functional as F
 from tqdm import tqdm
 
+# Let the CUDA caching allocator grow segments instead of fragmenting during
+# long generations. This must be set before CUDA is initialized, and older
+# PyTorch versions reject the option. When importing this module after CUDA
+# is already in use, export PYTORCH_CUDA_ALLOC_CONF in the launch script.
+if tuple(int(v) for v in torch.__version__.split(".")[:2]) >= (2, 1):
+    os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
+# How many timesteps to run the scripted generation step before generating, so
+# that TorchScript profiling and optimization happen up front.
+JIT_WARMUP_STEPS: int = 2
+
+# How many timesteps to run on a side stream before capturing the generation
+# step into a CUDA graph.
+CUDA_GRAPH_WARMUP_STEPS: int = 3
+
+# Autocast dtypes for each supported 'mixed_precision' setting.
+MIXED_PRECISION_DTYPES: Dict[str, Optional[torch.dtype]] = {
+    "none": None,
+    "bf16": torch.bfloat16,
+    "fp16": torch.float16,
+}
+
 
 @dataclass
 class SchedulerConfig:
@@ -117,6 +138,20 @@ class ModelConfig:
     upsample_params: UpsampleConfig = MISSING
     lr_schedule: Optional[str] = None
     lr_schedule_kwargs: Optional[SchedulerConfig] = None
+    # Compile the training forward pass with torch.compile (PyTorch 2.0+).
+    compile_model: bool = False
+    # Run the per-timestep generation step as a TorchScript function.
+    script_generate: bool = False
+    # Capture the per-timestep generation step in a CUDA graph (PyTorch 1.10+).
+    # Ignored when generating on CPU.
+    cuda_graph_generate: bool = False
+    # Disable cuDNN autotuning and TF32 for bit-exact reproducible runs.
+    deterministic: bool = False
+    # Autocast precision for training and generation: none, bf16, or fp16.
+    mixed_precision: str = "none"
+    # Copy generated samples to pinned host memory on a side stream as they
+    # are produced, so generate() returns a CPU tensor. Ignored on CPU.
+    host_output: bool = False
 
 
 @dataclass
@@ -129,12 +164,158 @@ class Config:
     model: ModelConfig = MISSING
 
 
+@torch.jit.script
+def mu_law_encode(x: Tensor, mu: float) -> Tensor:
+    """
+    Mu-law encode a waveform. Same as torchaudio.transforms.MuLawEncoding, but
+    scripted so that the elementwise ops are fused into a single kernel.
+
+    Args:
+      x: Waveform in [-1, 1].
+      mu: Number of quantization channels minus one.
+
+    Returns:
+      Integer labels in [0, mu].
+    """
+    x_mu = torch.sign(x) * torch.log1p(mu * torch.abs(x)) / math.log1p(mu)
+    return ((x_mu + 1) / 2 * mu + 0.5).to(torch.int64)
+
+
+@torch.jit.script
+def mu_law_decode(x_mu: Tensor, mu: float) -> Tensor:
+    """
+    Mu-law decode labels. Same as torchaudio.transforms.MuLawDecoding, but
+    scripted so that the elementwise ops are fused into a single kernel.
+
+    Args:
+      x_mu: Labels in [0, mu].
+      mu: Number of quantization channels minus one.
+
+    Returns:
+      Waveform in [-1, 1].
+    """
+    x = x_mu.float() / mu * 2 - 1.0
+    return torch.sign(x) * (torch.exp(torch.abs(x) * math.log1p(mu)) - 1.0) / mu
+
+
+@torch.jit.script
+def argmax_mu_law_decode(x: Tensor, mu: float) -> Tensor:
+    """
+    Mu-law decode the most likely label at each timestep. Scripted together so
+    the label cast is fused into the decode kernel that follows the argmax.
+
+    Args:
+      x: One-hot samples of shape [batch_size, n_samples, mu + 1].
+      mu: Number of quantization channels minus one.
+
+    Returns:
+      Waveform in [-1, 1] of shape [batch_size, n_samples].
+    """
+    return mu_law_decode(x.argmax(dim=2), mu)
+
+
+def conditioning_projection(ct: Tensor, weight: Tensor) -> Tensor:
+    """
+    Project conditioning features for all residual layers at once.
+    """
+    return F.linear(ct, weight)
+
+
+@torch.jit.script
+def incremental_step(
+    x: Tensor,
+    ct: Tensor,
+    first_conv: Tuple[Tensor, Tensor],
+    conditioning: Tensor,
+    conv_layers: List[Tuple[Tensor, Tensor, Tensor, Tensor, Tensor, Tensor]],
+    dilations: List[int],
+    buffers: List[Tensor],
+    last_conv_layers: List[Tuple[Tensor, Tensor]],
+    skip_scale: float,
+) -> Tensor:
+    """
+    Run a single timestep of the WaveNet in incremental mode. This is the same
+    computation as the modules' incremental_forward(), but on linearized
+    weights passed in explicitly so that it can be scripted.
+
+    Args:
+      x: The previous sample, of shape [batch_size, in_channels].
+      ct: Conditioning features, of shape [batch_size, cin_channels].
+      first_conv: Weight and bias of the input 1x1 convolution.
+      conditioning: Conditioning weights of all residual layers, concatenated
+        along the output dimension.
+      conv_layers: For each residual layer, linearized dilated convolution
+        weight and bias, skip weight and bias, and output weight and bias.
+      dilations: Dilation of each residual layer.
+      buffers: Input buffer of each residual layer, of shape
+        [batch_size, receptive_field, residual_channels]. Updated in place.
+      last_conv_layers: Weight and bias of the output 1x1 convolutions. Each
+        one is preceded by a ReLU.
+      skip_scale: Scale applied to each skip connection before summing.
+
+    Returns:
+      Output logits of shape [batch_size, out_channels].
+    """
+    # The conditioning projection doesn't depend on the residual chain, so run
+    # it as one matmul for all layers. On CPU, fork it to overlap with the input
+    # convolution; CUDA kernels are already asynchronous, and forking there
+    # would launch work from another thread during CUDA graph capture.
+    batch_size = x.size(0)
+    if ct.is_cuda:
+        cond = conditioning_projection(ct, conditioning)
+        x = F.linear(x, first_conv[0], first_conv[1])
+    else:
+        future = torch.jit.fork(conditioning_projection, ct, conditioning)
+        x = F.linear(x, first_conv[0], first_conv[1])
+        cond = torch.jit.wait(future)
+    cs = cond.chunk(len(conv_layers), dim=-1)
+
+    skips = x.new_zeros([batch_size, last_conv_layers[0][0].size(1)])
+    for i in range(len(conv_layers)):
+        conv_w, conv_b, skip_w, skip_b, out_w, out_b = conv_layers[i]
+        buffer = buffers[i]
+        residual = x
+
+        # Shift the buffer and append the current input.
+        buffer[:, :-1] = buffer[:, 1:].clone()
+        buffer[:, -1] = x
+        h = F.linear(buffer[:, :: dilations[i]].reshape(batch_size, -1), conv_w, conv_b)
+
+        a, b = h.chunk(2, dim=-1)
+        ca, cb = cs[i].chunk(2, dim=-1)
+        h = torch.tanh(a + ca) * torch.sigmoid(b + cb)
+
+        skips.add_(F.linear(h, skip_w, skip_b), alpha=skip_scale)
+        x = (F.linear(h, out_w, out_b) + residual) * math.sqrt(0.5)
+
+    x = skips
+    for weight, bias in last_conv_layers:
+        x = F.linear(torch.relu(x), weight, bias)
+    return x
+
+
+def linearized_weight(conv: Conv1d) -> Tensor:
+    """
+    Get the weight of a convolution in the layout used by incremental_forward().
+
+    Args:
+      conv: The convolution. Weight normalization hooks are applied first.
+
+    Returns:
+      The weight as a matrix of shape [out_channels, kernel_size * in_channels].
+    """
+    for hook in conv._forward_pre_hooks.values():  # pylint: disable=protected-access
+        hook(conv, None)
+    return conv._get_linearized_weight()  # pylint: disable=protected-access
+
+
 class WaveNet(Vocoder):
     """
     WaveNet model.
     """
 
     command: str = "wavenet"
+    supports_distributed: bool = True
 
     def __init__(self, config: Config) -> None:
         """
@@ -145,44 +326,110 @@ class WaveNet(Vocoder):
         self.config = config
         self.scalar_input: bool = is_scalar_input(config.model.input_type)
 
-        self.model = torch.nn.DataParallel(
-            wavenet.WaveNet(
-                out_channels=config.model.out_channels,
-                layers=config.model.layers,
-                stacks=config.model.stacks,
-                residual_channels=config.model.residual_channels,
-                gate_channels=config.model.gate_channels,
-                skip_out_channels=config.model.skip_out_channels,
-                cin_channels=config.model.cin_channels,
-                gin_channels=config.model.gin_channels,
-                n_speakers=config.model.n_speakers,
-                dropout=config.model.dropout,
-                kernel_size=config.model.kernel_size,
-                cin_pad=config.model.cin_pad,
-                upsample_conditional_features=config.model.upsample_conditional_features,
-                upsample_params=config.model.upsample_params,
-                scalar_input=self.scalar_input,
-                output_distribution=config.model.output_distribution,
+        # Unless determinism is requested, let cuDNN pick the fastest algorithm
+        # for each dilated convolution shape, and use TF32 for convolutions and
+        # matmuls on Ampere or newer. cudnn.deterministic is then left as the
+        # caller set it.
+        if config.model.deterministic:
+            torch.backends.cudnn.deterministic = True
+            torch.backends.cudnn.benchmark = False
+            torch.backends.cudnn.allow_tf32 = False
+            torch.backends.cuda.matmul.allow_tf32 = False
+        else:
+            torch.backends.cudnn.benchmark = True
+            torch.backends.cudnn.allow_tf32 = True
+            torch.backends.cuda.matmul.allow_tf32 = True
+
+        module = wavenet.WaveNet(
+            out_channels=config.model.out_channels,
+            layers=config.model.layers,
+            stacks=config.model.stacks,
+            residual_channels=config.model.residual_channels,
+            gate_channels=config.model.gate_channels,
+            skip_out_channels=config.model.skip_out_channels,
+            cin_channels=config.model.cin_channels,
+            gin_channels=config.model.gin_channels,
+            n_speakers=config.model.n_speakers,
+            dropout=config.model.dropout,
+            kernel_size=config.model.kernel_size,
+            cin_pad=config.model.cin_pad,
+            upsample_conditional_features=config.model.upsample_conditional_features,
+            upsample_params=config.model.upsample_params,
+            scalar_input=self.scalar_input,
+            output_distribution=config.model.output_distribution,
+        )
+
+        # When launched with torchrun, use one process per GPU so that gradient
+        # all-reduce overlaps with the backward pass. Both wrappers expose the
+        # network as `.module`, so checkpoints are interchangeable.
+        if torch.distributed.is_available() and torch.distributed.is_initialized():
+            local_rank = torch.cuda.current_device()
+            self.model = torch.nn.parallel.DistributedDataParallel(
+                module.to(local_rank),
+                device_ids=[local_rank],
+                output_device=local_rank,
+                broadcast_buffers=False,
+                # Global conditioning layers exist when gin_channels > 0, but
+                # no speaker features are ever passed, so they get no gradient.
+                find_unused_parameters=config.model.gin_channels > 0,
+            )
+        else:
+            self.model = torch.nn.DataParallel(module)
+
+        # Training batches have a static shape, so "reduce-overhead" can replay
+        # the captured CUDA graph every step. The bound method is compiled
+        # rather than the module so the state_dict keys don't change.
+        self.compiled_forward: Optional[Callable[..., Tensor]] = None
+        if config.model.compile_model:
+            if not hasattr(torch, "compile"):
+                raise RuntimeError("compile_model requires PyTorch 2.0 or newer")
+            self.compiled_forward = torch.compile(
+                self.model.forward, mode="reduce-overhead", fullgraph=False
             )
+
+        if config.model.mixed_precision not in MIXED_PRECISION_DTYPES:
+            raise RuntimeError(
+                "Not supported mixed precision type: {}".format(
+                    config.model.mixed_precision
+                )
+            )
+        self.autocast = self.create_autocast(cache_enabled=True)
+        # Autocast's weight cache can't be used while capturing CUDA graphs,
+        # so generation gets its own context with the cache disabled.
+        if config.model.cuda_graph_generate:
+            self.generate_autocast = self.create_autocast(cache_enabled=False)
+        else:
+            self.generate_autocast = self.autocast
+        # Only fp16 needs loss scaling; bf16 has the same range as fp32.
+        self.scaler = torch.cuda.amp.GradScaler(
+            enabled=config.model.mixed_precision == "fp16"
         )
 
         self.optimizer: torch.optim.Optimizer = torch.optim.Adam(
             self.parameters(), lr=self.config.model.learning_rate
         )
-        self.compand: torch.nn.Module = torchaudio.transforms.MuLawEncoding(
-            config.model.quantize_channels
-        )
-        self.expand: torch.nn.Module = torchaudio.transforms.MuLawDecoding(
-            config.model.quantize_channels
-        )
+        # Scales used by label_2_float() and float_2_label().
+        self.label_2_float_scale: float = 2.0 / (config.model.quantize_channels - 1.0)
+        self.float_2_label_scale: float = (config.model.quantize_channels - 1.0) / 2.0
+
+        self.mu: float = config.model.quantize_channels - 1.0
 
+        # Side stream for copying generated samples to the host. Created on
+        # first use, so that building the model doesn't initialize CUDA.
+        self.copy_stream: Optional[torch.cuda.Stream] = None
+
+        # The sampler is chosen once here, so the generation loop has no
+        # branches on the input type or output distribution.
         if is_mulaw_quantize(config.model.input_type):
             self.criterion: torch.nn.Module = torch.nn.CrossEntropyLoss()
+            self.sample: Callable[[Tensor], Tensor] = self.sample_categorical
         else:
             if config.model.output_distribution == "Logistic":
                 self.criterion: torch.nn.Module = DiscretizedMixturelogisticLoss(config)
+                self.sample: Callable[[Tensor], Tensor] = self.sample_logistic
             elif config.model.output_distribution == "Normal":
                 self.criterion: torch.nn.Module = MixtureGaussianLoss(config)
+                self.sample: Callable[[Tensor], Tensor] = self.sample_gaussian
             else:
                 raise RuntimeError(
                     "Not supported output distribution type: {}".format(
@@ -190,6 +437,31 @@ class WaveNet(Vocoder):
                     )
                 )
 
+    def create_autocast(self, cache_enabled: bool) -> ContextManager[None]:
+        """
+        Create the autocast context for the configured mixed precision.
+
+        Args:
+          cache_enabled: Whether autocast may cache casted weights.
+
+        Returns:
+          An autocast context manager, disabled if mixed precision is off.
+        """
+        dtype = MIXED_PRECISION_DTYPES[self.config.model.mixed_precision]
+        if dtype is None:
+            return torch.cuda.amp.autocast(enabled=False)
+        if dtype == torch.float16 and cache_enabled:
+            return torch.cuda.amp.autocast(enabled=True)
+        if not hasattr(torch, "autocast"):
+            raise RuntimeError(
+                "mixed_precision={} requires PyTorch 1.10 or newer".format(
+                    self.config.model.mixed_precision
+                )
+            )
+        return torch.autocast(
+            device_type="cuda", dtype=dtype, cache_enabled=cache_enabled
+        )
+
     @staticmethod
     def default_config() -> ConfigProtocol:
         """
@@ -238,34 +510,38 @@ class WaveNet(Vocoder):
 
         # Forward pass.
 
-        target = waveforms[:, 1:]  # [batch_size, n_samples-1]
-
         if self.config.model.input_type in ["mulaw", "mulaw-quantize"]:
-            waveforms = self.compand(waveforms)  # [batch_size, n_samples]
-            target = self.compand(target)
+            # The target is the input shifted by one, so encode once and slice.
+            waveforms = mu_law_encode(waveforms, self.mu)  # [batch_size, n_samples]
 
             if self.config.model.input_type == "mulaw":
-                waveforms = self.label_2_float(
-                    waveforms, self.config.model.quantize_channels
-                )
+                waveforms = self.label_2_float(waveforms)
+                target = waveforms[:, 1:]
                 waveforms = waveforms.unsqueeze(1)
-
-                target = self.label_2_float(target, self.config.model.quantize_channels)
             else:
-                waveforms = F.one_hot(waveforms, self.config.model.quantize_channels)
-                waveforms = waveforms.transpose(1, 2).float()
+                target = waveforms[:, 1:]
+                waveforms = self.one_hot(waveforms)
 
         elif self.config.model.input_type == "raw":
+            target = waveforms[:, 1:]  # [batch_size, n_samples-1]
             waveforms = waveforms.unsqueeze(1)
         else:
             raise RuntimeError(
                 "Not supported input type: {}".format(self.config.model.input_type)
             )
 
-        output = self.model(waveforms, c=spectrograms)  # pyre-ignore
+        # Validation and trailing batches can be ragged, so only use the
+        # compiled forward for full training batches to avoid recompiling on
+        # every new shape.
+        full_batch = waveforms.size(0) == self.config.dataset.batch_size
+        with self.autocast:
+            if self.compiled_forward is not None and self.training and full_batch:
+                output = self.compiled_forward(waveforms, c=spectrograms)
+            else:
+                output = self.model(waveforms, c=spectrograms)  # pyre-ignore
         if self.config.model.input_type in ["mulaw", "raw"]:
             target = target.unsqueeze(2)  # [batch_size, n_samples-1, 1]
-        loss = self.criterion(output[:, :, :-1], target)
+        loss = self.criterion(output[:, :, :-1].float(), target)
 
         return loss
 
@@ -299,8 +575,9 @@ class WaveNet(Vocoder):
 
         # Backward pass.
         self.optimizer.zero_grad()
-        loss.backward()
-        self.optimizer.step()
+        self.scaler.scale(loss).backward()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
         return loss, {}
 
     def validation_losses(
@@ -326,51 +603,69 @@ class WaveNet(Vocoder):
         self.model.eval()  # pyre-ignore
         self.model.module.clear_buffer()  # pyre-ignore
 
-        with torch.no_grad():
+        with torch.no_grad(), self.generate_autocast:
             spectrograms = self.model.module.upsample_net(spectrograms)
             seq_len = (
                 22050 if training else spectrograms.size(-1)
             )  # synthesize the first second only during training
             batch_size = spectrograms.shape[0]
-            spectrograms = spectrograms.transpose(1, 2).contiguous()
+            # Keep step inputs in fp32 so the scripted step sees a single dtype;
+            # autocast still casts them for each eager op.
+            spectrograms = spectrograms.transpose(1, 2).float().contiguous()
 
-            if self.scalar_input:
-                x = spectrograms.new_zeros(batch_size, 1, 1)
+            in_channels = 1 if self.scalar_input else self.config.model.out_channels
+            x = spectrograms.new_zeros(batch_size, in_channels)
+
+            buffers: Optional[List[Tensor]] = None
+            if self.config.model.script_generate:
+                step, buffers = self.scripted_step(x, spectrograms[:, 0, :])
             else:
-                x = spectrograms.new_zeros(
-                    batch_size, 1, self.config.model.out_channels
-                )
+                step = self.eager_step()
+            if self.config.model.cuda_graph_generate and spectrograms.is_cuda:
+                step = self.graphed_step(step, x, spectrograms[:, 0, :], buffers)
+
+            # Release temporaries from warmup before the long generation loop.
+            warmed_up = (
+                self.config.model.script_generate
+                or self.config.model.cuda_graph_generate
+            )
+            if warmed_up and spectrograms.is_cuda:
+                torch.cuda.empty_cache()
+
+            copy_stream: Optional[torch.cuda.Stream] = None
+            if self.config.model.host_output and spectrograms.is_cuda:
+                if self.copy_stream is None:
+                    self.copy_stream = torch.cuda.Stream()
+                copy_stream = self.copy_stream
+                # Time-major, so each timestep is copied into a contiguous
+                # slice of pinned memory rather than through a pageable
+                # temporary.
+                output = torch.empty(seq_len, batch_size, in_channels, pin_memory=True)
+            else:
+                output = spectrograms.new_empty(batch_size, seq_len, in_channels)
 
-            output = []
             for t in tqdm(range(seq_len)):
                 # Conditioning features for single time step
-                ct = spectrograms[:, t, :].unsqueeze(1)
-                x = self.model.module.first_conv.incremental_forward(x)
-                skips = 0
-                for f in self.model.module.conv_layers:
-                    x, h = f.incremental_forward(x, ct, None)
-                    skips += h
-                skips *= math.sqrt(1.0 / len(self.model.module.conv_layers))
-                x = skips
-                for f in self.model.module.last_conv_layers:
-                    try:
-                        x = f.incremental_forward(x)
-                    except AttributeError:
-                        x = f(x)
-                x, output = self.get_x_from_dist(
-                    self.config.model.output_distribution,
-                    x,
-                    history=output,
-                    B=batch_size,
-                )
-        output = torch.stack(output).transpose(0, 1)
+                x = self.sample(step(x, spectrograms[:, t, :]))
+                if copy_stream is None:
+                    output[:, t].copy_(x)
+                else:
+                    # Overlap the device-to-host copy with the next timestep.
+                    # record_stream() keeps x alive until the copy is done.
+                    copy_stream.wait_stream(torch.cuda.current_stream())
+                    with torch.cuda.stream(copy_stream):
+                        output[t].copy_(x, non_blocking=True)
+                    x.record_stream(copy_stream)
+
+            if copy_stream is not None:
+                copy_stream.synchronize()
+                output = output.transpose(0, 1)
 
         if self.config.model.input_type in ["mulaw", "mulaw-quantize"]:
             if self.config.model.input_type == "mulaw-quantize":
-                output = torch.argmax(output, dim=2)
+                output = argmax_mu_law_decode(output, self.mu)
             else:
-                output = self.float_2_label(output, self.config.model.quantize_channels)
-            output = self.expand(output.long())
+                output = mu_law_decode(self.float_2_label(output).long(), self.mu)
         elif self.config.model.input_type != "raw":
             raise RuntimeError(
                 "Not supported input type: {}".format(self.config.model.input_type)
@@ -380,43 +675,246 @@ class WaveNet(Vocoder):
 
         return output.flatten()
 
-    def get_x_from_dist(
+    def eager_step(self) -> Callable[[Tensor, Tensor], Tensor]:
+        """
+        Create a function running a single timestep of the network in
+        incremental mode. The layers and skip scale are looked up once here
+        rather than on every timestep.
+
+        Returns:
+          A function taking the previous sample, of shape
+          [batch_size, in_channels], and conditioning features, of shape
+          [batch_size, cin_channels], and returning output logits of shape
+          [batch_size, out_channels].
+        """
+        model = self.model.module  # pyre-ignore
+        first_conv = model.first_conv.incremental_forward
+        first_layer, *conv_layers = [f.incremental_forward for f in model.conv_layers]
+        last_conv_layers = [
+            f.incremental_forward if isinstance(f, Conv1d) else f
+            for f in model.last_conv_layers
+        ]
+        skip_scale = math.sqrt(1.0 / len(model.conv_layers))
+
+        def step(x: Tensor, ct: Tensor) -> Tensor:
+            x = first_conv(x.unsqueeze(1))
+            ct = ct.unsqueeze(1)
+
+            # Scale each skip connection as it is accumulated in place, so
+            # there are no temporaries and no separate scaling pass.
+            x, h = first_layer(x, ct, None)
+            skips = h.mul(skip_scale)
+            for f in conv_layers:
+                x, h = f(x, ct, None)
+                skips.add_(h, alpha=skip_scale)
+            x = skips
+            for f in last_conv_layers:
+                x = f(x)
+            return x.squeeze(1)
+
+        return step
+
+    def scripted_step(
+        self, x: Tensor, ct: Tensor
+    ) -> Tuple[Callable[[Tensor, Tensor], Tensor], List[Tensor]]:
+        """
+        Create a TorchScript version of eager_step() bound to the current weights.
+        The weights are gathered on every call, since they change in training.
+
+        Args:
+          x: An example previous sample, used for shapes during warmup.
+          ct: Example conditioning features, used for shapes during warmup.
+
+        Returns:
+          A step function like eager_step() returns, and the input buffers
+          it updates.
+        """
+        model = self.model.module  # pyre-ignore
+
+        first_conv = (linearized_weight(model.first_conv), model.first_conv.bias)
+        conv_layers = []
+        dilations = []
+        buffers = []
+        for f in model.conv_layers:
+            conv_layers.append(
+                (
+                    linearized_weight(f.conv),
+                    f.conv.bias,
+                    linearized_weight(f.conv1x1_skip),
+                    f.conv1x1_skip.bias,
+                    linearized_weight(f.conv1x1_out),
+                    f.conv1x1_out.bias,
+                )
+            )
+            kernel_size, dilation = f.conv.kernel_size[0], f.conv.dilation[0]
+            dilations.append(dilation)
+            buffers.append(
+                x.new_zeros(
+                    x.size(0), (kernel_size - 1) * dilation + 1, f.conv.in_channels
+                )
+            )
+        conditioning = torch.cat(
+            [linearized_weight(f.conv1x1c) for f in model.conv_layers]
+        )
+        last_conv_layers = [
+            (linearized_weight(f), f.bias)
+            for f in model.last_conv_layers
+            if isinstance(f, Conv1d)
+        ]
+        skip_scale = math.sqrt(1.0 / len(model.conv_layers))
+
+        def step(x: Tensor, ct: Tensor) -> Tensor:
+            return incremental_step(
+                x,
+                ct,
+                first_conv,
+                conditioning,
+                conv_layers,
+                dilations,
+                buffers,
+                last_conv_layers,
+                skip_scale,
+            )
+
+        # Warm up so the JIT optimizes the graph, then reset the buffers.
+        for _ in range(JIT_WARMUP_STEPS):
+            step(x, ct)
+        for buffer in buffers:
+            buffer.zero_()
+
+        return step, buffers
+
+    def graphed_step(
         self,
-        distrib: str,
-        logits: Tensor,
-        history: List[Tensor],
-        B: int,
-        softmax: bool = True,
-        quantize: bool = True,
-    ) -> Tuple[Tensor, List[Tensor]]:
+        step: Callable[[Tensor, Tensor], Tensor],
+        x: Tensor,
+        ct: Tensor,
+        buffers: Optional[List[Tensor]] = None,
+    ) -> Callable[[Tensor, Tensor], Tensor]:
         """
-        Sampling from a given distribution
+        Capture a generation step into a CUDA graph. Every timestep has the same
+        shapes, so the graph is captured once and replayed, which removes the
+        launch overhead of the many tiny kernels in each step.
+
+        Args:
+          step: The step function to capture, from eager_step() or
+            scripted_step().
+          x: An example previous sample, used for shapes.
+          ct: Example conditioning features, used for shapes.
+          buffers: Input buffers updated by the step function. If None, these
+            are the input buffers of the incremental convolutions.
 
         Returns:
-            a tuple of current sample x and history of an array of previous samples
-        """
-        # Generate next input by sampling
-        if self.scalar_input:
-            if distrib == "Logistic":
-                x = sample_from_discretized_mix_logistic(logits.view(B, -1, 1))
-            elif distrib == "Normal":
-                x = sample_from_mix_gaussian(logits.view(B, -1, 1))
-            else:
-                raise AssertionError()
-        else:
-            x = F.softmax(logits.view(B, -1), dim=1) if softmax else logits.view(B, -1)
-            if quantize:
-                dist = torch.distributions.OneHotCategorical(x)
-                x = dist.sample()
+          A step function with the same signature. Its output is only
+          valid until the next call.
+        """
+        if not hasattr(torch.cuda, "graph"):
+            raise RuntimeError("cuda_graph_generate requires PyTorch 1.10 or newer")
+
+        static_x = x.clone()
+        static_ct = ct.clone()
+
+        # Warm up on a side stream, as required before capture.
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(CUDA_GRAPH_WARMUP_STEPS):
+                step(static_x, static_ct)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_output = step(static_x, static_ct)
+
+        # Capture doesn't run the step, but warmup did. Reset the buffers in
+        # place, since the graph refers to their memory.
+        if buffers is None:
+            buffers = [
+                m.input_buffer
+                for m in self.model.module.modules()  # pyre-ignore
+                if isinstance(m, Conv1d) and m.input_buffer is not None
+            ]
+        for buffer in buffers:
+            buffer.zero_()
+
+        def replay(x: Tensor, ct: Tensor) -> Tensor:
+            static_x.copy_(x)
+            static_ct.copy_(ct)
+            graph.replay()
+            return static_output
+
+        return replay
+
+    def sample_logistic(self, logits: Tensor) -> Tensor:
+        """
+        Sample from a discretized mixture of logistics, in full precision even
+        when generating with autocast.
+
+        Args:
+          logits: Output logits of shape [batch_size, out_channels].
+
+        Returns:
+          The current sample x, of shape [batch_size, 1].
+        """
+        return sample_from_discretized_mix_logistic(logits.float().unsqueeze(-1))
 
-        history.append(x.data)
-        return history[-1], history
+    def sample_gaussian(self, logits: Tensor) -> Tensor:
+        """
+        Sample from a mixture of Gaussians, in full precision even when
+        generating with autocast.
 
-    def label_2_float(self, x, n_classes):
-        return 2 * x / (n_classes - 1.0) - 1.0
+        Args:
+          logits: Output logits of shape [batch_size, out_channels].
 
-    def float_2_label(self, x, n_classes):
-        return (x + 1.0) * (n_classes - 1) / 2
+        Returns:
+          The current sample x, of shape [batch_size, 1].
+        """
+        return sample_from_mix_gaussian(logits.float().unsqueeze(-1))
+
+    def sample_categorical(self, logits: Tensor) -> Tensor:
+        """
+        Sample a one-hot label from the softmax of the logits, in full
+        precision even when generating with autocast.
+
+        Args:
+          logits: Output logits of shape [batch_size, out_channels].
+
+        Returns:
+          The current sample x, of shape [batch_size, out_channels].
+        """
+        probs = F.softmax(logits.float(), dim=1)
+        # Sample directly rather than constructing a OneHotCategorical, which
+        # validates its arguments on every timestep.
+        return torch.zeros_like(probs).scatter_(1, torch.multinomial(probs, 1), 1.0)
+
+    def label_2_float(self, x: Tensor) -> Tensor:
+        """
+        Map mu-law labels in [0, quantize_channels - 1] to floats in [-1, 1].
+        """
+        return x.mul(self.label_2_float_scale).sub_(1.0)
+
+    def float_2_label(self, x: Tensor) -> Tensor:
+        """
+        Map floats in [-1, 1] to mu-law labels in [0, quantize_channels - 1].
+        """
+        return x.add(1.0).mul_(self.float_2_label_scale)
+
+    def one_hot(self, x: Tensor) -> Tensor:
+        """
+        One-hot encode mu-law labels. Scatters straight into a float tensor in
+        channels-first layout, instead of F.one_hot() followed by a transpose
+        and a cast.
+
+        Args:
+          x: Labels of shape [batch_size, n_samples].
+
+        Returns:
+          Float tensor of shape [batch_size, quantize_channels, n_samples].
+        """
+        output = x.new_zeros(
+            x.size(0), self.config.model.quantize_channels, x.size(1), dtype=torch.float
+        )
+        return output.scatter_(1, x.unsqueeze(1), 1.0)
 
     def get_complexity(
         self,
@@ -435,16 +933,13 @@ class WaveNet(Vocoder):
         )
 
         if self.config.model.input_type in ["mulaw", "mulaw-quantize"]:
-            waveforms = self.compand(waveforms)  # [batch_size, n_samples]
+            waveforms = mu_law_encode(waveforms, self.mu)  # [batch_size, n_samples]
 
             if self.config.model.input_type == "mulaw":
-                waveforms = self.label_2_float(
-                    waveforms, self.config.model.quantize_channels
-                )
+                waveforms = self.label_2_float(waveforms)
                 waveforms = waveforms.unsqueeze(1)
             else:
-                waveforms = F.one_hot(waveforms, self.config.model.quantize_channels)
-                waveforms = waveforms.transpose(1, 2).float()
+                waveforms = self.one_hot(waveforms)
 
         elif self.config.model.input_type == "raw":
             waveforms = waveforms.unsqueeze(1)
@@ -44,6 +44,62 @@ def hard_exit(code: int = 1) -> None:
     os._exit(code)  # pylint: disable=protected-access
 
 
+def distributed_rank() -> int:
+    """
+    Get the rank of this process in distributed training.
+
+    Returns:
+      The global rank, or zero if torch.distributed is not initialized.
+    """
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        return torch.distributed.get_rank()
+    return 0
+
+
+def distributed_world_size() -> int:
+    """
+    Get the number of processes taking part in distributed training.
+
+    Returns:
+      The world size, or one if torch.distributed is not initialized.
+    """
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        return torch.distributed.get_world_size()
+    return 1
+
+
+def is_main_process() -> bool:
+    """
+    Whether this process should write logs, checkpoints, and samples.
+    """
+    return distributed_rank() == 0
+
+
+def distributed_barrier() -> None:
+    """
+    Wait for all distributed processes. Does nothing when not distributed.
+    """
+    if torch.distributed.is_available() and torch.distributed.is_initialized():
+        torch.distributed.barrier()
+
+
+def distributed_mean(tensor: "torch.Tensor") -> "torch.Tensor":
+    """
+    Average a tensor across distributed processes. Every process must call this.
+
+    Args:
+      tensor: The local value.
+
+    Returns:
+      The mean over all processes, or the tensor itself if not distributed.
+    """
+    if distributed_world_size() == 1:
+        return tensor
+    tensor = tensor.detach().clone()
+    torch.distributed.all_reduce(tensor)
+    return tensor / distributed_world_size()
+
+
 def write_audio(
     filename: str, data: Union["torch.Tensor", np.ndarray], sample_rate: int
 ) -> None: